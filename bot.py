@@ -8,9 +8,16 @@ from telegram.ext import (
     ContextTypes,
     CallbackQueryHandler,
 )
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import io
+import time
 import aiohttp
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
 import httpx
 
 
@@ -25,6 +32,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Optional chart rendering (pip install matplotlib)
+try:
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.dates import date2num
+except ImportError:
+    Figure = None
+
 # --- Handlers ---
 
 
@@ -497,6 +512,221 @@ countries = {
 }
 
 
+# Chart rendering runs off the event loop; the Agg canvas is used directly
+# (no pyplot), so figures can be drawn safely from worker threads.
+chart_executor = ThreadPoolExecutor(max_workers=2)
+
+# (country_code, dataset_version) -> {"png", "file_id", "lock", "users"},
+# least recently used first
+chart_cache = OrderedDict()
+chart_stats = {"hits": 0, "misses": 0, "renders": 0, "render_seconds": 0.0}
+CHART_CACHE_SIZE = 32
+CHART_STATS_EVERY = 100
+
+
+async def fetch_day_ahead_prices(country_code):
+    """Fetch the day-ahead price series for a country"""
+    url = f"{NGROK_URL}/api/market-price/day-ahead?country={country_code}"
+    headers = {
+        "Authorization": f"Bearer {API_TOKEN}",
+        "Accept": "application/json",
+    }
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url, headers=headers, timeout=10) as response:
+            response.raise_for_status()
+            json_response = await response.json()
+
+    return json_response.get("data", [])
+
+
+def price_dataset_version(price_data):
+    """Return a short digest identifying this exact price series"""
+    digest = hashlib.sha1()
+    for entry in price_data:
+        digest.update(f"{entry.get('time')}={entry.get('price')};".encode())
+    return digest.hexdigest()[:16]
+
+
+def render_price_chart(country_name, points):
+    """Render (iso_time, price) points to PNG bytes. Runs in chart_executor."""
+    series = sorted(
+        (
+            datetime.fromisoformat(t.replace("Z", "+00:00")),
+            float(p) if p is not None else float("nan"),
+        )
+        for t, p in points
+    )
+    times = [t for t, _ in series]
+    prices = [p for _, p in series]
+
+    # Close the last slot so where="post" draws it too
+    step = times[-1] - times[-2] if len(times) > 1 else timedelta(hours=1)
+    times.append(times[-1] + step)
+    prices.append(prices[-1])
+
+    fig = Figure(figsize=(8, 4), dpi=100)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    ax.step(times, prices, where="post", color="#1f77b4")
+    # Shade each slot on its own so a missing price only blanks its own slot
+    ax.stairs(
+        prices[:-1], date2num(times), fill=True, alpha=0.2, color="#1f77b4"
+    )
+    ax.xaxis_date()
+    ax.set_title(f"Day-ahead prices - {country_name}")
+    ax.set_ylabel("€/MWh")
+    ax.grid(True, alpha=0.3)
+    fig.autofmt_xdate()
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+def log_chart_stats():
+    lookups = chart_stats["hits"] + chart_stats["misses"]
+    renders = chart_stats["renders"]
+    logger.info(
+        "Chart cache: %d/%d hits (%.0f%%), %d renders, avg render %.3fs",
+        chart_stats["hits"],
+        lookups,
+        100 * chart_stats["hits"] / lookups if lookups else 0,
+        renders,
+        chart_stats["render_seconds"] / renders if renders else 0,
+    )
+
+
+def get_chart_entry(key):
+    """Return the cache entry for key, creating it and evicting idle ones"""
+    entry = chart_cache.get(key)
+    if entry is not None:
+        chart_cache.move_to_end(key)
+        return entry
+
+    def idle(k):
+        return k != key and chart_cache[k]["users"] == 0
+
+    # Older versions of the same country's series are stale
+    for stale in [k for k in chart_cache if k[0] == key[0] and idle(k)]:
+        del chart_cache[stale]
+
+    entry = chart_cache[key] = {
+        "png": None,
+        "file_id": None,
+        "lock": asyncio.Lock(),
+        "users": 0,
+    }
+
+    # Least recently used first, never while someone holds or awaits the lock
+    for stale in [k for k in chart_cache if idle(k)]:
+        if len(chart_cache) <= CHART_CACHE_SIZE:
+            break
+        del chart_cache[stale]
+
+    return entry
+
+
+async def send_cached_chart(message, entry, caption):
+    """Re-send a chart by file_id; drop the file_id if Telegram rejects it"""
+    try:
+        await message.reply_photo(photo=entry["file_id"], caption=caption)
+        return True
+    except BadRequest as e:
+        logger.warning(f"Cached chart file_id rejected, re-uploading: {e}")
+        entry["file_id"] = None
+        return False
+
+
+async def show_price_chart(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send the day-ahead prices for a country as a cached chart image"""
+    query = update.callback_query
+    await query.answer()
+
+    country_code = query.data.replace("chart_", "")
+
+    if Figure is None:
+        await query.message.reply_text(
+            "ℹ️ Chart view is not available (matplotlib is not installed)."
+        )
+        return
+
+    try:
+        price_data = await fetch_day_ahead_prices(country_code)
+        points = [
+            (entry["time"], entry.get("price"))
+            for entry in price_data
+            if entry.get("time")
+        ]
+        if not points:
+            await query.message.reply_text(
+                "ℹ️ No price data available for this country."
+            )
+            return
+
+        country_name = next(
+            (name for name, code in countries.items() if code == country_code),
+            country_code,
+        )
+        key = (country_code, price_dataset_version(price_data))
+        caption = f"📈 Market Prices for {country_name}"
+    except Exception as e:
+        logger.error(f"Error fetching prices for chart: {e}")
+        await query.message.reply_text(
+            "⚠️ Failed to fetch prices. Please try again later."
+        )
+        return
+
+    entry = get_chart_entry(key)
+    entry["users"] += 1
+    rendered = False
+    try:
+        # Fast path: already uploaded once, re-send by Telegram file_id
+        if entry["file_id"] and await send_cached_chart(query.message, entry, caption):
+            chart_stats["hits"] += 1
+            return
+
+        # Only one render and one upload per key, concurrent viewers wait here
+        async with entry["lock"]:
+            if entry["file_id"] and await send_cached_chart(
+                query.message, entry, caption
+            ):
+                chart_stats["hits"] += 1
+                return
+
+            chart_stats["misses"] += 1
+            if entry["png"] is None:
+                started = time.perf_counter()
+                entry["png"] = await asyncio.get_running_loop().run_in_executor(
+                    chart_executor, render_price_chart, country_name, points
+                )
+                chart_stats["renders"] += 1
+                chart_stats["render_seconds"] += time.perf_counter() - started
+                rendered = True
+
+            sent = await query.message.reply_photo(photo=entry["png"], caption=caption)
+            if sent.photo:
+                entry["file_id"] = sent.photo[-1].file_id
+
+    except Exception as e:
+        logger.error(f"Error rendering price chart: {e}")
+        await query.message.reply_text(
+            "⚠️ Failed to render price chart. Please try again later."
+        )
+
+    finally:
+        entry["users"] -= 1
+        # A failed render leaves nothing worth keeping, lock included
+        if entry["png"] is None and not entry["users"]:
+            if chart_cache.get(key) is entry:
+                del chart_cache[key]
+
+        lookups = chart_stats["hits"] + chart_stats["misses"]
+        if rendered or lookups % CHART_STATS_EVERY == 0:
+            log_chart_stats()
+
+
 async def marketprices(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show country selection for market prices"""
     keyboard = [
@@ -516,21 +746,11 @@ async def show_prices(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     country_code = query.data.replace("prices_", "")
-    url = f"{NGROK_URL}/api/market-price/day-ahead?country={country_code}"
-    headers = {
-        "Authorization": f"Bearer {API_TOKEN}",
-        "Accept": "application/json",
-    }
 
     await query.edit_message_text("⏳ Fetching market prices...")
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, timeout=10) as response:
-                response.raise_for_status()
-                json_response = await response.json()
-
-        price_data = json_response.get("data", [])
+        price_data = await fetch_day_ahead_prices(country_code)
 
         if not price_data:
             msg = "ℹ️ No price data available for this country."
@@ -565,7 +785,10 @@ async def show_prices(update: Update, context: ContextTypes.DEFAULT_TYPE):
             [
                 InlineKeyboardButton(
                     "🔄 Refresh", callback_data=f"prices_{country_code}"
-                )
+                ),
+                InlineKeyboardButton(
+                    "📈 Chart", callback_data=f"chart_{country_code}"
+                ),
             ],
             [InlineKeyboardButton("🌍 Change Country", callback_data="change_country")],
         ]
@@ -643,6 +866,7 @@ def main():
     app.add_handler(CommandHandler("vehicles", vehicles))
     app.add_handler(CommandHandler("marketprices", marketprices))
     app.add_handler(CallbackQueryHandler(show_prices, pattern="^prices_"))
+    app.add_handler(CallbackQueryHandler(show_price_chart, pattern="^chart_"))
     app.add_handler(CallbackQueryHandler(back_to_devices, pattern="^back_to_devices$"))
     app.add_handler(CallbackQueryHandler(change_country, pattern="^change_country$"))
     app.add_handler(